@@ -0,0 +1,110 @@
+"""
+Compara a latência do Servidor real com o caminho de envio legado (send por resposta sem checar o retorno,
+Nagle ativo e select aguardando escrita, o que faz cada thread de cliente girar sem parar) e com o caminho
+atual (EscritorResposta, TCP_NODELAY e select só para leitura). Vários clientes consultam saldos em paralelo.
+
+Uso: PYTHONPATH=pixson python benchmarks/escrita_respostas.py [clientes] [requisicoes_por_cliente]
+"""
+from __future__ import annotations
+
+import json
+import os
+import select
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from recursos import utils
+from recursos.conta import Conta
+from recursos.enums import ModoInicializacao
+from recursos.protocolo import OperacaoSaldo
+from reproducao import aceitar_conexoes, obter_porta_livre, percentil
+from servidor import Servidor
+
+CLIENTES = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+REQUISICOES = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+
+class EscritorLegado:
+    def __init__(self, cliente_socket: socket.socket) -> None:
+        self.socket = cliente_socket
+
+    def escrever(self, resposta: str) -> None:
+        self.socket.send(resposta.encode())
+
+    def descarregar(self) -> None:
+        pass
+
+
+class ServidorLegado(Servidor):
+    def aceitar_conexao(self) -> None:
+        cliente_socket, _ = self.socket.accept()
+        threading.Thread(target=self.processar_operacoes_cliente, args=(cliente_socket,)).start()
+
+    def processar_operacoes_cliente(self, cliente_socket, conexao: int = 0) -> None:
+        escritor = EscritorLegado(cliente_socket)
+        while self.disponivel:
+            ready_to_read, ready_to_write, in_error = select.select([cliente_socket], [cliente_socket], [], 5)
+            if len(ready_to_read) > 0:
+                mensagem = cliente_socket.recv(utils.TAMANHO_BUFFER_PADRAO).decode()
+                if not mensagem:
+                    break
+                self.processar_operacao(escritor=escritor, mensagem=mensagem)
+        cliente_socket.close()
+
+
+def consultar(porta: int, rg: str, latencias: list[float]) -> None:
+    with socket.create_connection(('127.0.0.1', porta)) as cliente_socket:
+        for tempo in range(REQUISICOES):
+            inicio = time.perf_counter()
+            cliente_socket.sendall(OperacaoSaldo(tempo=tempo, rg=rg).encapsular().encode())
+            cliente_socket.recv(utils.TAMANHO_BUFFER_PADRAO)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+
+def medir(classe: type[Servidor]) -> tuple[list[float], float]:
+    latencias = []
+    with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+        servidor = classe(modo_inicializacao=ModoInicializacao.BLOQUEANTE, porta=obter_porta_livre())
+        servidor.iniciar()
+        threading.Thread(target=aceitar_conexoes, args=(servidor,), daemon=True).start()
+        rgs = Conta.listar_rgs_por_atividade()
+        threads = [
+            threading.Thread(target=consultar, args=(servidor.porta, rgs[i % len(rgs)], latencias))
+            for i in range(CLIENTES)
+        ]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        servidor.desconectar()
+        time.sleep(0.2)
+    return sorted(latencias), duracao
+
+
+def relatar(nome: str, latencias: list[float], duracao: float) -> None:
+    print(f'{nome:<10} {len(latencias) / duracao:8.0f} req/s  media={statistics.mean(latencias):7.3f} ms  '
+          f'p50={percentil(latencias, 0.5):7.3f} ms  p99={percentil(latencias, 0.99):7.3f} ms')
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as pasta:
+        for i in range(10):
+            rg = str(i) * 10
+            with open(Path(pasta) / f'{rg}.json', 'w') as f:
+                json.dump({'rg': rg, 'nome': 'Bench', 'saldo': 1000.0}, f)
+        Conta.usar_pasta(pasta)
+        print(f'{CLIENTES} clientes, {REQUISICOES} consultas de saldo por cliente')
+        relatar('legado', *medir(ServidorLegado))
+        relatar('atual', *medir(Servidor))
+
+
+if __name__ == '__main__':
+    main()
@@ -49,6 +49,7 @@ class Cliente:
         Conecta o cliente ao servidor.
         """
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        utils.configurar_socket_tcp(self.socket)
         try:
             self.socket.connect((HOST_SERVIDOR, PORTA_SERVIDOR))
             self.conectado = True
@@ -80,7 +81,7 @@ class Cliente:
         """
         if isinstance(mensagem, str):
             mensagem = mensagem.encode()
-        self.socket.send(mensagem)
+        self.socket.sendall(mensagem)
 
     def receber_mensagem(self) -> str:
         """
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import gzip
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+from recursos.conta import Conta
+
+PASTA_CAPTURAS = "capturas"
+CABECALHO = "#pixson-captura 1"
+PREFIXO_CONTAS = "#contas "
+PREFIXO_SALDOS = "#saldos "
+
+
+def exportar_contas() -> list[dict]:
+    """
+    Exporta o estado atual de todas as contas.
+    :rtype: list[dict]
+    """
+    contas = [Conta.obter_conta(rg=rg) for rg in Conta.listar_rgs_por_atividade()]
+    return [dict(conta.__dict__) for conta in contas if conta is not None]
+
+
+class Portao:
+    def __init__(self) -> None:
+        """
+        Construtor da classe Portao. Requisições passam pelo portão com "with portao:"; fechado() espera as
+        requisições em curso terminarem e segura as novas até ser reaberto, criando um ponto de quiescência.
+        """
+        self.condicao = threading.Condition()
+        self.em_curso = 0
+        self.bloqueado = False
+
+    def __enter__(self) -> Portao:
+        with self.condicao:
+            while self.bloqueado:
+                self.condicao.wait()
+            self.em_curso += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        with self.condicao:
+            self.em_curso -= 1
+            if self.em_curso == 0:
+                self.condicao.notify_all()
+
+    @contextmanager
+    def fechado(self):
+        """
+        Fecha o portão durante o bloco, depois que todas as requisições em curso terminarem.
+        """
+        with self.condicao:
+            while self.bloqueado:
+                self.condicao.wait()
+            self.bloqueado = True
+            while self.em_curso > 0:
+                self.condicao.wait()
+        try:
+            yield
+        finally:
+            with self.condicao:
+                self.bloqueado = False
+                self.condicao.notify_all()
+
+
+class Gravador:
+    def __init__(self, caminho: str | Path | None = None) -> None:
+        """
+        Construtor da classe Gravador. Abre o arquivo de captura e grava o estado inicial das contas,
+        que deve ser lido sem requisições em curso (ver Portao).
+        Cada mensagem ocupa uma linha "<microssegundos desde o início>\\t<conexão>\\t<mensagem em JSON>",
+        na ordem em que foram aplicadas, e o arquivo é comprimido com gzip.
+        :param caminho: Arquivo de captura; por padrão, um novo arquivo em PASTA_CAPTURAS.
+        :type caminho: str or Path or None
+        """
+        if caminho is None:
+            caminho = Path(PASTA_CAPTURAS) / f"{time.strftime('%Y%m%d-%H%M%S')}.trace.gz"
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.arquivo = gzip.open(self.caminho, 'wt')
+        self.arquivo.write(f"{CABECALHO}\n{PREFIXO_CONTAS}{json.dumps(exportar_contas())}\n")
+        self.inicio = time.perf_counter_ns()
+
+    def agora(self) -> int:
+        """
+        Retorna os microssegundos decorridos desde o início da captura.
+        :rtype: int
+        """
+        return (time.perf_counter_ns() - self.inicio) // 1000
+
+    def processar(self, conexao: int, mensagem: str, processar: Callable[[], None]) -> None:
+        """
+        Processa uma mensagem e a registra. Durante a captura as mensagens são processadas uma por vez,
+        então a ordem no arquivo é exatamente a ordem em que foram aplicadas.
+        :param conexao: Identificador da conexão.
+        :type conexao: int
+        :param mensagem: Mensagem recebida do cliente.
+        :type mensagem: str
+        :param processar: Função que processa a mensagem.
+        :type processar: Callable[[], None]
+        """
+        instante = self.agora()
+        with self.lock:
+            processar()
+            self.registrar(conexao=conexao, mensagem=mensagem, instante=instante)
+
+    def registrar(self, conexao: int, mensagem: str, instante: int) -> None:
+        """
+        Registra uma mensagem já processada.
+        :param conexao: Identificador da conexão.
+        :type conexao: int
+        :param mensagem: Mensagem recebida do cliente.
+        :type mensagem: str
+        :param instante: Momento em que a mensagem foi recebida, obtido com agora().
+        :type instante: int
+        """
+        linha = f"{instante}\t{conexao}\t{json.dumps(mensagem, ensure_ascii=False)}\n"
+        with self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.write(linha)
+
+    def fechar(self) -> Path:
+        """
+        Grava os saldos finais das contas e fecha o arquivo de captura. Deve ser chamado sem requisições
+        em curso (ver Portao).
+        :rtype: Path
+        """
+        saldos = {conta['rg']: conta['saldo'] for conta in exportar_contas()}
+        with self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.write(f"{PREFIXO_SALDOS}{json.dumps(saldos)}\n")
+                self.arquivo.close()
+        return self.caminho
+
+
+class Captura:
+    def __init__(self, contas: list[dict], mensagens: list[tuple[int, int, str]], saldos: dict[str, float] | None) -> None:
+        """
+        Construtor da classe Captura.
+        :param contas: Estado das contas no início da captura.
+        :type contas: list[dict]
+        :param mensagens: Mensagens como (microssegundos desde o início, conexão, mensagem).
+        :type mensagens: list[tuple[int, int, str]]
+        :param saldos: Saldos das contas ao fim da captura, se a captura foi fechada.
+        :type saldos: dict[str, float] or None
+        """
+        self.contas = contas
+        self.mensagens = mensagens
+        self.saldos = saldos
+
+    @staticmethod
+    def ler(caminho: str | Path) -> Captura:
+        """
+        Lê um arquivo de captura gravado pelo Gravador.
+        :param caminho: Arquivo de captura.
+        :type caminho: str or Path
+        :rtype: Captura
+        """
+        contas, mensagens, saldos = [], [], None
+        with gzip.open(caminho, 'rt') as f:
+            if f.readline().rstrip('\n') != CABECALHO:
+                raise ValueError(f'{caminho} não é um arquivo de captura')
+            for linha in f:
+                if linha.startswith(PREFIXO_CONTAS):
+                    contas = json.loads(linha[len(PREFIXO_CONTAS):])
+                elif linha.startswith(PREFIXO_SALDOS):
+                    saldos = json.loads(linha[len(PREFIXO_SALDOS):])
+                elif linha.strip():
+                    instante, conexao, mensagem = linha.rstrip('\n').split('\t', 2)
+                    mensagens.append((int(instante), int(conexao), json.loads(mensagem)))
+        return Captura(contas=contas, mensagens=mensagens, saldos=saldos)
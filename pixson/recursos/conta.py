@@ -1,36 +1,113 @@
 from __future__ import annotations
 import json
+import threading
 from pathlib import Path
 
 PASTA_CONTAS = "contas"
 
+_cache: dict[str, Conta] = {}
+_cache_lock = threading.Lock()
+_gravacao_locks: dict[str, threading.Lock] = {}
+_versoes_gravadas: dict[str, int] = {}
+
 
 class Conta:
-    def __init__(self, rg: str, nome: str, saldo: float):
+    def __init__(self, rg: str, nome: str, saldo: float, versao: int = 0):
         """
-        Construtor da classe Conta.
+        Construtor da classe Conta. Uma vez no cache, a instância não é mais alterada:
+        cada atualização cria uma nova versão da conta.
         :param rg: RG do cliente.
         :type rg: str
         :param nome: Nome do cliente.
         :type nome: str
         :param saldo: Saldo da conta.
         :type saldo: float
+        :param versao: Versão da conta, incrementada a cada atualização.
+        :type versao: int
         """
         self.rg = rg
         self.nome = nome
         self.saldo = saldo
+        self.versao = versao
 
     @staticmethod
     def obter_conta(rg: str) -> Conta | None:
         """
-        Obtém uma conta a partir do RG do cliente.
+        Obtém uma conta a partir do RG do cliente, consultando primeiro o cache.
+        :rtype: Conta or None
+        """
+        conta = _cache.get(rg)
+        if conta is not None:
+            return conta
+        return Conta.carregar_conta(rg=rg)
+
+    @staticmethod
+    def carregar_conta(rg: str) -> Conta | None:
+        """
+        Carrega uma conta do arquivo para o cache, se ela ainda não estiver lá. O arquivo é lido fora do
+        lock do cache; se outra thread publicar a conta nesse meio tempo, a versão do cache prevalece.
+        :param rg: RG do cliente.
+        :type rg: str
         :rtype: Conta or None
         """
-        arquivo = Path(f"{PASTA_CONTAS}/{rg}.json")
-        if arquivo.exists():
-            with open(arquivo, "r") as f:
-                return Conta(**json.load(f))
-        return None
+        conta = _cache.get(rg)
+        if conta is not None:
+            return conta
+        try:
+            with open(Path(f"{PASTA_CONTAS}/{rg}.json"), "r") as f:
+                conta = Conta(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            # Só há gravação em curso se a conta já foi publicada no cache.
+            conta = _cache.get(rg)
+            if conta is None:
+                raise
+            return conta
+        with _cache_lock:
+            return _cache.setdefault(rg, conta)
+
+    @staticmethod
+    def usar_pasta(pasta: str) -> None:
+        """
+        Passa a ler e gravar as contas na pasta informada, esvaziando o cache.
+        :param pasta: Pasta com os arquivos das contas.
+        :type pasta: str
+        """
+        global PASTA_CONTAS
+        with _cache_lock:
+            PASTA_CONTAS = pasta
+            _cache.clear()
+            _versoes_gravadas.clear()
+
+    @staticmethod
+    def listar_rgs_por_atividade() -> list[str]:
+        """
+        Lista os RGs das contas, das modificadas mais recentemente para as mais antigas.
+        :rtype: list[str]
+        """
+        arquivos = []
+        for arquivo in Path(PASTA_CONTAS).glob("*.json"):
+            try:
+                arquivos.append((arquivo.stat().st_mtime, arquivo.stem))
+            except FileNotFoundError:
+                continue
+        return [rg for _, rg in sorted(arquivos, reverse=True)]
+
+    @staticmethod
+    def aquecer_cache(parar: threading.Event | None = None) -> int:
+        """
+        Carrega as contas para o cache, das mais ativas para as menos ativas.
+        :param parar: Evento que interrompe o aquecimento quando sinalizado.
+        :type parar: threading.Event or None
+        :return: Quantidade de contas no cache.
+        :rtype: int
+        """
+        for rg in Conta.listar_rgs_por_atividade():
+            if parar is not None and parar.is_set():
+                break
+            Conta.carregar_conta(rg=rg)
+        return len(_cache)
 
     def salvar(self) -> None:
         """
@@ -40,33 +117,97 @@ class Conta:
         with open(arquivo, "w") as f:
             json.dump(self.__dict__, f)
 
-    def depositar(self, valor: float) -> None:
+    def persistir(self) -> None:
+        """
+        Grava esta versão da conta no arquivo, a menos que uma versão mais nova já tenha sido gravada.
+        As gravações de uma mesma conta são serializadas, então o arquivo nunca volta a uma versão antiga.
+        """
+        with _gravacao_locks.setdefault(self.rg, threading.Lock()):
+            if _versoes_gravadas.get(self.rg, -1) >= self.versao:
+                return
+            self.salvar()
+            _versoes_gravadas[self.rg] = self.versao
+
+    def com_saldo(self, saldo: float) -> Conta:
+        """
+        Cria a próxima versão da conta com o saldo informado.
+        :param saldo: Novo saldo.
+        :type saldo: float
+        :rtype: Conta
+        """
+        return Conta(rg=self.rg, nome=self.nome, saldo=saldo, versao=self.versao + 1)
+
+    @staticmethod
+    def comparar_e_trocar(*novas: Conta) -> bool:
+        """
+        Publica as novas versões das contas no cache, desde que nenhuma delas tenha sido atualizada
+        desde que foi lida. A publicação no cache é atômica: ou todas as versões entram, ou nenhuma.
+        Os arquivos são gravados depois, fora do lock do cache; se uma gravação falhar, o erro é
+        propagado e o arquivo daquela conta fica desatualizado até a próxima atualização dela.
+        :param novas: Novas versões das contas, criadas com com_saldo.
+        :type novas: Conta
+        :return: False se alguma conta mudou de versão no meio tempo.
+        :rtype: bool
+        """
+        if len({nova.rg for nova in novas}) != len(novas):
+            raise ValueError('Cada conta só pode aparecer uma vez')
+        with _cache_lock:
+            for nova in novas:
+                atual = _cache.get(nova.rg)
+                if atual is None or atual.versao != nova.versao - 1:
+                    return False
+            for nova in novas:
+                _cache[nova.rg] = nova
+        for nova in novas:
+            nova.persistir()
+        return True
+
+    def depositar(self, valor: float) -> bool:
         """
-        Deposita um valor na conta.
+        Deposita um valor na conta, tentando novamente em caso de conflito de versão.
         :param valor: Valor a ser depositado.
         :type valor: float
+        :return: True quando o depósito é realizado.
+        :rtype: bool
         """
-        self.saldo += valor
-        self.salvar()
+        conta = self
+        while True:
+            if Conta.comparar_e_trocar(conta.com_saldo(conta.saldo + valor)):
+                return True
+            conta = Conta.obter_conta(rg=self.rg)
 
-    def sacar(self, valor: float) -> None:
+    def sacar(self, valor: float) -> bool:
         """
-        Sacar um valor da conta.
+        Sacar um valor da conta, se houver saldo, tentando novamente em caso de conflito de versão.
         :param valor: Valor a ser sacado.
         :type valor: float
+        :return: False se o saldo for insuficiente.
+        :rtype: bool
         """
-        self.saldo -= valor
-        self.salvar()
+        conta = self
+        while True:
+            if conta.saldo < valor:
+                return False
+            if Conta.comparar_e_trocar(conta.com_saldo(conta.saldo - valor)):
+                return True
+            conta = Conta.obter_conta(rg=self.rg)
 
-    def transferir(self, conta_destino: Conta, valor: float) -> None:
+    def transferir(self, conta_destino: Conta, valor: float) -> bool:
         """
-        Transfere um valor de uma conta para outra.
+        Transfere um valor de uma conta para outra, se houver saldo, tentando novamente em caso de
+        conflito de versão.
         :param conta_destino: Conta de destino.
         :type conta_destino: Conta
         :param valor: Valor a ser transferido.
         :type valor: float
+        :return: False se o saldo for insuficiente.
+        :rtype: bool
         """
-        self.sacar(valor)
-        conta_destino.depositar(valor)
-        self.salvar()
-        conta_destino.salvar()
+        origem, destino = self, conta_destino
+        while True:
+            if origem.saldo < valor:
+                return False
+            if Conta.comparar_e_trocar(origem.com_saldo(origem.saldo - valor), destino.com_saldo(destino.saldo + valor)):
+                return True
+            origem = Conta.obter_conta(rg=self.rg)
+            destino = Conta.obter_conta(rg=conta_destino.rg)
@@ -8,9 +8,22 @@ class Operacoes(Enum):
     TRANSFERENCIA = 4
     SINCRONIZAR_RELOGIO = 5
     LOGIN = 6
+    ESTADO = 7
     SAIR = 0
 
 
 class Resposta(Enum):
     OK = 0
     ERRO = 1
+
+
+class ModoInicializacao(Enum):
+    SOB_DEMANDA = 0
+    BLOQUEANTE = 1
+    SEGUNDO_PLANO = 2
+
+
+class ModoPerfil(Enum):
+    TRECHOS = 0
+    CPROFILE = 1
+    AMOSTRAGEM = 2
@@ -0,0 +1,56 @@
+from __future__ import annotations
+import socket
+
+from recursos import utils
+
+
+class EscritorResposta:
+    def __init__(self, cliente_socket: socket.socket, capacidade: int = utils.TAMANHO_BUFFER_PADRAO) -> None:
+        """
+        Construtor da classe EscritorResposta.
+        :param cliente_socket: Socket do cliente.
+        :type cliente_socket: socket.socket
+        :param capacidade: Tamanho inicial do buffer de saída.
+        :type capacidade: int
+        """
+        self.socket = cliente_socket
+        self.buffer = bytearray(capacidade)
+        self.visao = memoryview(self.buffer)
+        self.tamanho = 0
+
+    def escrever(self, resposta: str) -> None:
+        """
+        Acrescenta uma resposta ao buffer, sem enviá-la.
+        :param resposta: Resposta encapsulada.
+        :type resposta: str
+        """
+        dados = resposta.encode()
+        fim = self.tamanho + len(dados)
+        if fim > len(self.buffer):
+            self.crescer(fim)
+        self.buffer[self.tamanho:fim] = dados
+        self.tamanho = fim
+
+    def crescer(self, tamanho_minimo: int) -> None:
+        """
+        Aumenta o buffer para comportar pelo menos o tamanho informado.
+        :param tamanho_minimo: Tamanho mínimo necessário.
+        :type tamanho_minimo: int
+        """
+        capacidade = len(self.buffer)
+        while capacidade < tamanho_minimo:
+            capacidade *= 2
+        self.visao.release()
+        self.buffer.extend(bytes(capacidade - len(self.buffer)))
+        self.visao = memoryview(self.buffer)
+
+    def descarregar(self) -> None:
+        """
+        Envia todas as respostas acumuladas numa única chamada e esvazia o buffer.
+        """
+        if self.tamanho == 0:
+            return
+        try:
+            self.socket.sendall(self.visao[:self.tamanho])
+        finally:
+            self.tamanho = 0
@@ -0,0 +1,368 @@
+from __future__ import annotations
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from pathlib import Path
+
+from recursos.enums import ModoPerfil
+
+PASTA_PERFIL = "perfil"
+LIMITE_EVENTOS = 1_000_000
+INTERVALO_AMOSTRAGEM = 0.001
+ESPERA_GRAVACAO = 5
+
+# A partir do Python 3.12 o cProfile usa sys.monitoring, que vale para o processo inteiro:
+# só um perfil pode estar ativo por vez, e ele cobre todas as threads.
+CPROFILE_GLOBAL = sys.version_info >= (3, 12)
+
+TRECHO_NULO = nullcontext()
+
+
+class Trecho:
+    __slots__ = ('perfilador', 'nome', 'pilha', 'inicio', 'filhos', 'perfil', 'raiz', 'sessao', 'eventos', 'destino', 'tempo')
+
+    def __init__(self, perfilador: Perfilador, nome: str) -> None:
+        """
+        Construtor da classe Trecho.
+        :param perfilador: Perfilador que registra o trecho.
+        :type perfilador: Perfilador
+        :param nome: Nome do trecho (parse, lock, armazenamento, envio...).
+        :type nome: str
+        """
+        self.perfilador = perfilador
+        self.nome = nome
+        self.pilha = nome
+        self.inicio = 0
+        self.filhos = 0
+        self.perfil = None
+        self.raiz = self
+        self.sessao = None
+        self.eventos = None
+        self.destino = None
+        self.tempo = None
+
+    def __enter__(self) -> Trecho:
+        pilha = self.perfilador.pilha_atual()
+        if pilha:
+            pai = pilha[-1]
+            self.pilha = f"{pai.pilha};{self.nome}"
+            self.raiz = pai.raiz
+            self.sessao, self.eventos = pai.sessao, pai.eventos
+        else:
+            self.sessao, self.destino, perfis = self.perfilador.abrir_raiz()
+            if self.destino is not None:
+                self.eventos = []
+            if perfis is not None and self.perfilador.modo == ModoPerfil.CPROFILE and not CPROFILE_GLOBAL:
+                self.perfil = self.perfilador.iniciar_cprofile(perfis)
+        pilha.append(self)
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        duracao = time.perf_counter_ns() - self.inicio
+        if self.perfil is not None:
+            self.perfil.disable()
+        pilha = self.perfilador.pilha_atual()
+        if pilha and pilha[-1] is self:
+            pilha.pop()
+            if pilha:
+                pilha[-1].filhos += duracao
+        if self.eventos is not None:
+            self.eventos.append((self.pilha, threading.get_ident(), self.inicio, duracao, duracao - self.filhos, self.raiz))
+            if self.raiz is self:
+                self.perfilador.fechar_raiz(self.sessao, self.destino, self.eventos)
+
+
+class EsperaLock:
+    __slots__ = ('perfilador', 'lock')
+
+    def __init__(self, perfilador: Perfilador, lock) -> None:
+        """
+        Construtor da classe EsperaLock.
+        :param perfilador: Perfilador que registra a espera.
+        :type perfilador: Perfilador
+        :param lock: Lock a ser adquirido.
+        """
+        self.perfilador = perfilador
+        self.lock = lock
+
+    def __enter__(self) -> EsperaLock:
+        with Trecho(self.perfilador, 'lock'):
+            self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.lock.release()
+
+
+class Perfilador:
+    def __init__(self, modo: ModoPerfil = ModoPerfil.TRECHOS, pasta: str = PASTA_PERFIL) -> None:
+        """
+        Construtor da classe Perfilador. Começa desativado.
+        Cada ativação abre uma sessão com seus próprios eventos, perfis e amostras; trechos iniciados
+        numa sessão só são gravados com ela.
+        :param modo: Perfilamento feito além dos trechos quando ativado.
+        :type modo: ModoPerfil
+        :param pasta: Pasta onde os perfis são gravados.
+        :type pasta: str
+        """
+        self.modo = modo
+        self.pasta = pasta
+        self.ativo = False
+        self.sessao = 0
+        self.eventos = deque(maxlen=LIMITE_EVENTOS)
+        self.perfis = {}
+        self.amostras = Counter()
+        self.amostrador = None
+        self.em_curso = {}
+        self.aviso_cprofile = False
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.condicao = threading.Condition(self.lock)
+
+    def trecho(self, nome: str):
+        """
+        Cria um trecho cronometrado; quando desativado, devolve um contexto vazio.
+        :param nome: Nome do trecho.
+        :type nome: str
+        """
+        if not self.ativo:
+            return TRECHO_NULO
+        return Trecho(self, nome)
+
+    def esperar(self, lock):
+        """
+        Adquire o lock registrando o tempo de espera; quando desativado, devolve o próprio lock.
+        :param lock: Lock a ser adquirido.
+        """
+        if not self.ativo:
+            return lock
+        return EsperaLock(self, lock)
+
+    def marcar(self, tempo: int) -> None:
+        """
+        Associa o tempo lógico do servidor à requisição em curso nesta thread; todos os trechos dela,
+        inclusive os já encerrados, são gravados com esse tempo.
+        :param tempo: Tempo lógico atribuído à requisição.
+        :type tempo: int
+        """
+        if self.ativo:
+            pilha = self.pilha_atual()
+            if pilha:
+                pilha[0].tempo = tempo
+
+    def pilha_atual(self) -> list:
+        """
+        Retorna a pilha de trechos abertos da thread atual.
+        :rtype: list
+        """
+        pilha = getattr(self.local, 'pilha', None)
+        if pilha is None:
+            pilha = self.local.pilha = []
+        return pilha
+
+    def abrir_raiz(self) -> tuple:
+        """
+        Registra o início de um trecho raiz na sessão atual.
+        :return: Sessão, eventos e perfis da sessão, ou None em cada campo se o perfilador foi desativado.
+        :rtype: tuple
+        """
+        with self.condicao:
+            if not self.ativo:
+                return None, None, None
+            self.em_curso[self.sessao] = self.em_curso.get(self.sessao, 0) + 1
+            return self.sessao, self.eventos, self.perfis
+
+    def fechar_raiz(self, sessao: int, destino: deque, eventos: list) -> None:
+        """
+        Registra o fim de um trecho raiz da sessão informada e publica os trechos da requisição.
+        Se a sessão já foi gravada (a requisição durou mais que ESPERA_GRAVACAO), os trechos são descartados.
+        :param sessao: Sessão do trecho.
+        :type sessao: int
+        :param destino: Eventos da sessão.
+        :type destino: deque
+        :param eventos: Trechos da requisição.
+        :type eventos: list
+        """
+        with self.condicao:
+            if sessao not in self.em_curso:
+                return
+            destino.extend(eventos)
+            self.em_curso[sessao] -= 1
+            if self.em_curso[sessao] == 0:
+                self.condicao.notify_all()
+
+    def iniciar_cprofile(self, perfis: dict) -> cProfile.Profile | None:
+        """
+        Ativa o cProfile da thread atual, criando-o se necessário.
+        :param perfis: Perfis da sessão, por thread.
+        :type perfis: dict
+        :rtype: cProfile.Profile or None
+        """
+        identificador = threading.get_ident()
+        perfil = perfis.get(identificador)
+        if perfil is None:
+            perfil = perfis.setdefault(identificador, cProfile.Profile())
+        try:
+            perfil.enable()
+        except ValueError as erro:
+            self.avisar_cprofile(erro)
+            return None
+        return perfil
+
+    def avisar_cprofile(self, erro: Exception) -> None:
+        """
+        Avisa, uma vez por sessão, que o cProfile não pôde ser ativado.
+        :param erro: Erro devolvido pelo cProfile.
+        :type erro: Exception
+        """
+        if not self.aviso_cprofile:
+            self.aviso_cprofile = True
+            print(f"No fue posible activar cProfile: {erro}")
+
+    def amostrar(self, sessao: int, amostras: Counter) -> None:
+        """
+        Coleta periodicamente as pilhas das demais threads enquanto a sessão estiver ativa.
+        :param sessao: Sessão a que as amostras pertencem.
+        :type sessao: int
+        :param amostras: Contagem de amostras por pilha da sessão.
+        :type amostras: Counter
+        """
+        proprio = threading.get_ident()
+        while self.ativo and self.sessao == sessao:
+            for identificador, frame in sys._current_frames().items():
+                if identificador == proprio:
+                    continue
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{codigo.co_name} ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})")
+                    frame = frame.f_back
+                amostras[';'.join(reversed(pilha))] += 1
+            time.sleep(INTERVALO_AMOSTRAGEM)
+
+    def ativar(self) -> None:
+        """
+        Ativa o perfilamento, abrindo uma nova sessão.
+        """
+        with self.lock:
+            if self.ativo:
+                return
+            self.aviso_cprofile = False
+            if self.modo == ModoPerfil.CPROFILE and CPROFILE_GLOBAL:
+                perfil = cProfile.Profile()
+                try:
+                    perfil.enable()
+                    self.perfis['processo'] = perfil
+                except ValueError as erro:
+                    self.avisar_cprofile(erro)
+            if self.modo == ModoPerfil.AMOSTRAGEM:
+                self.amostrador = threading.Thread(target=self.amostrar, args=(self.sessao, self.amostras), daemon=True)
+            self.ativo = True
+            if self.amostrador is not None:
+                self.amostrador.start()
+        print(f"Perfilado activado ({self.modo.name.lower()})")
+
+    def desativar(self) -> threading.Thread | None:
+        """
+        Desativa o perfilamento e grava a sessão encerrada numa thread separada, depois que as
+        requisições ainda em curso nela terminarem.
+        :return: Thread que grava a sessão, ou None se o perfilador já estava desativado.
+        :rtype: threading.Thread or None
+        """
+        with self.lock:
+            if not self.ativo:
+                return None
+            self.ativo = False
+            sessao = self.sessao
+            self.sessao += 1
+            eventos, self.eventos = self.eventos, deque(maxlen=LIMITE_EVENTOS)
+            perfis, self.perfis = self.perfis, {}
+            amostras, self.amostras = self.amostras, Counter()
+            amostrador, self.amostrador = self.amostrador, None
+        if amostrador is not None:
+            amostrador.join()
+        if CPROFILE_GLOBAL and 'processo' in perfis:
+            perfis['processo'].disable()
+
+        gravacao = threading.Thread(target=self.gravar, args=(sessao, eventos, perfis, amostras))
+        gravacao.start()
+        return gravacao
+
+    def alternar(self) -> None:
+        """
+        Ativa o perfilamento se estiver desativado, e vice-versa.
+        """
+        if self.ativo:
+            self.desativar()
+        else:
+            self.ativar()
+
+    def gravar(self, sessao: int, eventos: deque, perfis: dict, amostras: Counter) -> Path:
+        """
+        Aguarda o fim das requisições da sessão e grava os trechos em formato Trace Event (speedscope,
+        Perfetto, chrome://tracing) e em pilhas colapsadas (flamegraph.pl, inferno), além dos perfis de
+        cProfile e das amostras.
+        :param sessao: Sessão encerrada.
+        :type sessao: int
+        :param eventos: Trechos da sessão.
+        :type eventos: deque
+        :param perfis: Perfis de cProfile da sessão, por thread (ou 'processo', no Python 3.12+).
+        :type perfis: dict
+        :param amostras: Amostras da sessão.
+        :type amostras: Counter
+        :rtype: Path
+        """
+        with self.condicao:
+            self.condicao.wait_for(lambda: self.em_curso.get(sessao, 0) == 0, timeout=ESPERA_GRAVACAO)
+            self.em_curso.pop(sessao, None)
+            eventos = list(eventos)
+
+        pasta = Path(self.pasta) / f"{time.strftime('%Y%m%d-%H%M%S')}-{sessao}"
+        pasta.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+
+        trechos = []
+        colapsadas = Counter()
+        for pilha, identificador, inicio, duracao, proprio, raiz in eventos:
+            trechos.append({
+                'name': pilha.rsplit(';', 1)[-1],
+                'cat': 'pixson',
+                'ph': 'X',
+                'ts': inicio / 1000,
+                'dur': duracao / 1000,
+                'pid': pid,
+                'tid': identificador,
+                'args': {'relogio': raiz.tempo}
+            })
+            colapsadas[pilha] += proprio // 1000
+        with open(pasta / 'trechos.json', 'w') as f:
+            json.dump({'traceEvents': trechos, 'displayTimeUnit': 'ms'}, f)
+        self.gravar_colapsadas(pasta / 'trechos.folded', colapsadas)
+
+        if amostras:
+            self.gravar_colapsadas(pasta / 'amostras.folded', amostras)
+
+        for identificador, perfil in perfis.items():
+            perfil.dump_stats(pasta / f'cprofile-{identificador}.prof')
+        print(f"Perfilado desactivado, perfiles en {pasta}")
+        return pasta
+
+    @staticmethod
+    def gravar_colapsadas(arquivo: Path, pilhas: Counter) -> None:
+        """
+        Grava pilhas no formato colapsado, uma por linha: "a;b;c valor".
+        :param arquivo: Arquivo de destino.
+        :type arquivo: Path
+        :param pilhas: Valor acumulado por pilha.
+        :type pilhas: Counter
+        """
+        with open(arquivo, 'w') as f:
+            for pilha, valor in pilhas.items():
+                if valor > 0:
+                    f.write(f"{pilha} {valor}\n")
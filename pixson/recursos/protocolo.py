@@ -126,6 +126,21 @@ class OperacaoLogin(Protocolo):
         return OperacaoLogin(tempo=int(tempo), rg=str(rg))
 
 
+class OperacaoEstado(Protocolo):
+    pattern = r'^t:([0-9]+)\|op:7$'
+
+    def __init__(self, tempo: int):
+        self.tempo = tempo
+
+    def encapsular(self) -> str:
+        return f"t:{self.tempo}|op:{Operacoes.ESTADO.value}"
+
+    @staticmethod
+    def desencapsular(mensagem: str) -> OperacaoEstado:
+        tempo, = match(OperacaoEstado.pattern, mensagem).groups()
+        return OperacaoEstado(tempo=int(tempo))
+
+
 class RespostaSucesso(Protocolo):
     pattern = r'^t:([0-9]+)\|s:0\|resposta:(.*)$'
 
@@ -18,3 +18,19 @@ def verificar_porta(porta: int) -> bool:
     except socket.error:
         s.close()
         return False
+
+
+def configurar_socket_tcp(s: socket.socket) -> None:
+    """
+    Desativa o algoritmo de Nagle e ativa o keepalive no socket TCP.
+    :param s: Socket a ser configurado.
+    :type s: socket.socket
+    """
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 5)
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from recursos import utils
+from recursos.captura import Captura
+from recursos.conta import Conta
+from recursos.enums import ModoInicializacao
+from servidor import Servidor
+
+ESPERA_CLIENTES = 10
+
+
+class Reprodutor:
+    def __init__(self, captura: Captura, velocidade: float = 1.0, concorrente: bool = False) -> None:
+        """
+        Construtor da classe Reprodutor.
+        :param captura: Captura a ser reproduzida.
+        :type captura: Captura
+        :param velocidade: Multiplicador do ritmo original; 0 envia o mais rápido possível.
+        :type velocidade: float
+        :param concorrente: Reproduz cada conexão numa thread própria, em vez de enviar as mensagens uma a
+        uma na ordem em que o servidor original as processou. A ordem entre conexões deixa de ser garantida,
+        então os saldos finais podem divergir dos gravados.
+        :type concorrente: bool
+        """
+        self.captura = captura
+        self.velocidade = velocidade
+        self.concorrente = concorrente
+        self.latencias = []
+        self.lock = threading.Lock()
+        self.inicio = 0.0
+        mensagens = captura.mensagens
+        self.deslocamento = min(mensagem[0] for mensagem in mensagens) if mensagens else 0
+
+    def aguardar(self, instante: int) -> None:
+        """
+        Aguarda até o momento em que a mensagem gravada no instante informado deve ser enviada.
+        :param instante: Microssegundos desde o início da captura.
+        :type instante: int
+        """
+        if self.velocidade <= 0:
+            return
+        espera = self.inicio + (instante - self.deslocamento) / 1e6 / self.velocidade - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+
+    def enviar(self, cliente_socket: socket.socket, mensagem: str) -> float:
+        """
+        Envia uma mensagem e aguarda a resposta.
+        :param cliente_socket: Socket conectado ao servidor.
+        :type cliente_socket: socket.socket
+        :param mensagem: Mensagem gravada.
+        :type mensagem: str
+        :return: Latência, em milissegundos.
+        :rtype: float
+        """
+        inicio = time.perf_counter()
+        cliente_socket.sendall(mensagem.encode())
+        cliente_socket.recv(utils.TAMANHO_BUFFER_PADRAO)
+        return (time.perf_counter() - inicio) * 1000
+
+    @staticmethod
+    def conectar(porta: int) -> socket.socket:
+        """
+        Conecta um novo cliente ao servidor local.
+        :param porta: Porta do servidor.
+        :type porta: int
+        :rtype: socket.socket
+        """
+        cliente_socket = socket.create_connection(('127.0.0.1', porta))
+        utils.configurar_socket_tcp(cliente_socket)
+        return cliente_socket
+
+    def reproduzir_conexao(self, porta: int, mensagens: list[tuple[int, int, str]]) -> None:
+        """
+        Reproduz as mensagens de uma conexão gravada.
+        :param porta: Porta do servidor.
+        :type porta: int
+        :param mensagens: Mensagens da conexão, na ordem gravada.
+        :type mensagens: list[tuple[int, int, str]]
+        """
+        latencias = []
+        with self.conectar(porta) as cliente_socket:
+            for instante, _, mensagem in mensagens:
+                self.aguardar(instante)
+                latencias.append(self.enviar(cliente_socket, mensagem))
+        with self.lock:
+            self.latencias.extend(latencias)
+
+    def reproduzir(self, porta: int) -> float:
+        """
+        Reproduz a captura contra o servidor na porta informada.
+        :param porta: Porta do servidor.
+        :type porta: int
+        :return: Duração da reprodução, em segundos.
+        :rtype: float
+        """
+        self.inicio = time.perf_counter()
+        if not self.concorrente:
+            sockets = {}
+            for instante, conexao, mensagem in self.captura.mensagens:
+                if conexao not in sockets:
+                    sockets[conexao] = self.conectar(porta)
+                self.aguardar(instante)
+                self.latencias.append(self.enviar(sockets[conexao], mensagem))
+            for cliente_socket in sockets.values():
+                cliente_socket.close()
+        else:
+            conexoes = {}
+            for mensagem in self.captura.mensagens:
+                conexoes.setdefault(mensagem[1], []).append(mensagem)
+            threads = [
+                threading.Thread(target=self.reproduzir_conexao, args=(porta, mensagens))
+                for mensagens in conexoes.values()
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return time.perf_counter() - self.inicio
+
+
+def preparar_contas(captura: Captura, destino: Path, contas: str | None = None) -> None:
+    """
+    Cria a pasta de contas do servidor local, a partir de um snapshot ou do estado gravado na captura.
+    :param captura: Captura a ser reproduzida.
+    :type captura: Captura
+    :param destino: Pasta a ser criada.
+    :type destino: Path
+    :param contas: Pasta com um snapshot de contas/, se informada.
+    :type contas: str or None
+    """
+    if contas is not None:
+        shutil.copytree(contas, destino)
+        return
+    destino.mkdir(parents=True)
+    for conta in captura.contas:
+        with open(destino / f"{conta['rg']}.json", "w") as f:
+            json.dump(conta, f)
+
+
+def obter_porta_livre() -> int:
+    """
+    Obtém uma porta TCP livre na máquina local.
+    :rtype: int
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def aceitar_conexoes(servidor: Servidor) -> None:
+    """
+    Aceita conexões até o servidor ser desconectado.
+    :param servidor: Servidor local.
+    :type servidor: Servidor
+    """
+    try:
+        while servidor.disponivel:
+            servidor.aceitar_conexao()
+    except OSError:
+        pass
+
+
+def reproduzir_localmente(reprodutor: Reprodutor) -> float:
+    """
+    Sobe um servidor local sobre a pasta de contas em uso, reproduz a captura contra ele e o desliga.
+    As mensagens impressas pelo servidor são descartadas.
+    :param reprodutor: Reprodutor da captura.
+    :type reprodutor: Reprodutor
+    :return: Duração da reprodução, em segundos.
+    :rtype: float
+    """
+    with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+        servidor = Servidor(modo_inicializacao=ModoInicializacao.BLOQUEANTE, porta=obter_porta_livre())
+        servidor.iniciar()
+        threading.Thread(target=aceitar_conexoes, args=(servidor,), daemon=True).start()
+        try:
+            return reprodutor.reproduzir(servidor.porta)
+        finally:
+            servidor.desconectar()
+            servidor.aguardar_clientes(timeout=ESPERA_CLIENTES)
+
+
+def comparar_saldos(esperados: dict[str, float]) -> list[str]:
+    """
+    Compara os saldos do servidor local com os saldos esperados.
+    :param esperados: Saldo esperado por RG.
+    :type esperados: dict[str, float]
+    :return: Descrição de cada divergência encontrada.
+    :rtype: list[str]
+    """
+    divergencias = []
+    for rg, saldo in esperados.items():
+        conta = Conta.obter_conta(rg=rg)
+        obtido = conta.saldo if conta is not None else None
+        if obtido is None or abs(obtido - saldo) > 1e-6:
+            divergencias.append(f"{rg}: esperado {saldo}, obtido {obtido}")
+    return divergencias
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """
+    Calcula o percentil de uma lista ordenada de valores.
+    :rtype: float
+    """
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main() -> None:
+    """
+    Reproduz uma captura contra um servidor local e relata vazão, latência e divergências de saldo.
+    """
+    parser = argparse.ArgumentParser(description='Reproduz uma captura de mensagens do servidor.')
+    parser.add_argument('captura', help='arquivo gravado pelo servidor (.trace.gz)')
+    parser.add_argument('--velocidade', type=float, default=1.0,
+                        help='multiplicador do ritmo original; 0 reproduz o mais rápido possível')
+    parser.add_argument('--contas', help='snapshot de contas/ a usar no lugar do estado gravado na captura')
+    parser.add_argument('--saldos', help='pasta contas/ com os saldos esperados ao final')
+    parser.add_argument('--concorrente', action='store_true',
+                        help='reproduz cada conexão numa thread própria; os saldos finais podem divergir e '
+                             'a comparação é apenas informativa')
+    argumentos = parser.parse_args()
+
+    captura = Captura.ler(argumentos.captura)
+    esperados = captura.saldos
+    if argumentos.saldos is not None:
+        esperados = {}
+        for arquivo in Path(argumentos.saldos).glob('*.json'):
+            with open(arquivo) as f:
+                esperados[arquivo.stem] = json.load(f)['saldo']
+
+    pasta = Path(tempfile.mkdtemp(prefix='pixson-'))
+    try:
+        preparar_contas(captura, pasta / 'contas', argumentos.contas)
+        Conta.usar_pasta(str(pasta / 'contas'))
+        reprodutor = Reprodutor(captura, velocidade=argumentos.velocidade, concorrente=argumentos.concorrente)
+        duracao = reproduzir_localmente(reprodutor)
+
+        latencias = sorted(reprodutor.latencias)
+        print(f"Mensajes: {len(latencias)} en {duracao:.3f} s ({len(latencias) / duracao if duracao else 0:.1f} msg/s)")
+        if latencias:
+            print(f"Latencia: media={statistics.mean(latencias):.3f} ms  p50={percentil(latencias, 0.5):.3f} ms  "
+                  f"p95={percentil(latencias, 0.95):.3f} ms  p99={percentil(latencias, 0.99):.3f} ms  "
+                  f"max={latencias[-1]:.3f} ms")
+
+        if esperados is None:
+            print('La captura no tiene saldos finales; comparación omitida')
+            return
+        divergencias = comparar_saldos(esperados)
+        if divergencias:
+            print(f"Saldos divergentes ({len(divergencias)}):")
+            for divergencia in divergencias:
+                print(f"  {divergencia}")
+            if argumentos.concorrente:
+                print('Reproducción concurrente: el orden entre conexiones no se conserva, divergencias solo informativas')
+                return
+            exit(1)
+        print(f"Saldos finales coinciden ({len(esperados)} cuentas)")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
+    exit()
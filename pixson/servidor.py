@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import itertools
 import signal
 import socket
 import select
@@ -11,7 +12,11 @@ import sys
 
 from recursos import utils
 from recursos.protocolo import *
+from recursos.captura import Gravador, Portao
 from recursos.conta import Conta
+from recursos.enums import ModoInicializacao, ModoPerfil
+from recursos.escritor import EscritorResposta
+from recursos.perfil import Perfilador
 
 PORTA_PADRAO = 5000
 
@@ -19,42 +24,116 @@ lock = threading.RLock()
 
 
 class Servidor:
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            modo_inicializacao: ModoInicializacao = ModoInicializacao.SEGUNDO_PLANO,
+            modo_perfil: ModoPerfil = ModoPerfil.TRECHOS,
+            porta: int = PORTA_PADRAO
+    ) -> None:
         """
         Construtor da classe Servidor.
-        """
-        if not utils.verificar_porta(porta=PORTA_PADRAO):
+        :param modo_inicializacao: Como o cache de contas é aquecido ao iniciar.
+        :type modo_inicializacao: ModoInicializacao
+        :param modo_perfil: Perfilamento feito quando o perfilador é ativado.
+        :type modo_perfil: ModoPerfil
+        :param porta: Porta em que o servidor escuta.
+        :type porta: int
+        """
+        if not utils.verificar_porta(porta=porta):
             print('El puerto ya está en uso')
             exit()
 
-        self.porta = PORTA_PADRAO
+        self.porta = porta
         self.socket = None
         self.relogio = 0
         self.disponivel = False
+        self.modo_inicializacao = modo_inicializacao
+        self.pronto = threading.Event()
+        self.parar_aquecimento = threading.Event()
+        self.perfilador = Perfilador(modo=modo_perfil)
+        self.gravador = None
+        self.portao = Portao()
+        self.conexoes = itertools.count(1)
+        self.clientes = []
 
-    def incrementar_relogio(self) -> None:
+    def esta_pronto(self) -> bool:
+        """
+        Indica se o cache de contas já foi aquecido. Os clientes consultam esse estado com OperacaoEstado.
+        :rtype: bool
+        """
+        return self.pronto.is_set()
+
+    def aquecer_contas(self) -> None:
+        """
+        Aquece o cache de contas, das mais ativas para as menos ativas, e sinaliza quando terminar.
+        """
+        quantidade = Conta.aquecer_cache(parar=self.parar_aquecimento)
+        if self.disponivel and not self.parar_aquecimento.is_set():
+            self.pronto.set()
+            print(f"Caché de cuentas listo ({quantidade} cuentas)")
+
+    def iniciar_captura(self, caminho: str | None = None) -> None:
+        """
+        Começa a gravar as mensagens recebidas num arquivo de captura.
+        :param caminho: Arquivo de captura; por padrão, um novo arquivo em capturas/.
+        :type caminho: str or None
+        """
+        with self.portao.fechado():
+            if self.gravador is not None:
+                return
+            gravador = self.gravador = Gravador(caminho=caminho)
+        print(f"Captura iniciada en {gravador.caminho}")
+
+    def encerrar_captura(self) -> None:
+        """
+        Para de gravar as mensagens recebidas e fecha o arquivo de captura.
+        """
+        with self.portao.fechado():
+            gravador, self.gravador = self.gravador, None
+            if gravador is None:
+                return
+            caminho = gravador.fechar()
+        print(f"Captura guardada en {caminho}")
+
+    def alternar_captura(self) -> None:
+        """
+        Inicia a captura se estiver parada, e vice-versa.
+        """
+        if self.gravador is None:
+            self.iniciar_captura()
+        else:
+            self.encerrar_captura()
+
+    def incrementar_relogio(self) -> int:
         """
         Incrementa o relógio do servidor.
+        :return: Valor do relógio após o incremento.
+        :rtype: int
         """
-        with lock:
+        with self.perfilador.esperar(lock):
             self.relogio += 1
-        print(f"Relógio Lógico Atualizado: {self.relogio}")
+            relogio = self.relogio
+        print(f"Relógio Lógico Atualizado: {relogio}")
+        return relogio
 
-    def atualizar_tempo(self, tempo: int) -> None:
+    def atualizar_tempo(self, tempo: int) -> int:
         """
         Atualiza o relógio com o tempo recebido, se ele for maior que o tempo atual e incrementa o relógio.
+        :return: Valor do relógio após a atualização.
+        :rtype: int
         """
-        with lock:
+        with self.perfilador.esperar(lock):
             self.relogio = max(self.relogio, tempo) + 1
-        print(f'Relógio Lógico Atualizado: {self.relogio}')
+            relogio = self.relogio
+        print(f'Relógio Lógico Atualizado: {relogio}')
+        return relogio
 
     def obter_e_incrementar_tempo(self) -> int:
         """
         Incrementa o relógio do servidor e retorna o valor atualizado.
         :rtype: int
         """
-        self.incrementar_relogio()
-        return self.relogio
+        return self.incrementar_relogio()
 
     def iniciar(self) -> None:
         """
@@ -66,26 +145,49 @@ class Servidor:
         self.disponivel = True
         print(f"El servidor se inició en el puerto {self.porta}")
 
+        if self.modo_inicializacao == ModoInicializacao.BLOQUEANTE:
+            self.aquecer_contas()
+        elif self.modo_inicializacao == ModoInicializacao.SEGUNDO_PLANO:
+            threading.Thread(target=self.aquecer_contas, daemon=True).start()
+        else:
+            self.pronto.set()
+
     def aceitar_conexao(self) -> None:
         """
         Aceita uma conexão de um cliente e processa as mensagens dele, numa nova thread.
         """
         cliente_socket, cliente_socket_host = self.socket.accept()
+        utils.configurar_socket_tcp(cliente_socket)
         print(f"Nuevo cliente conectado {cliente_socket_host}")
-        threading.Thread(target=self.processar_operacoes_cliente, args=(cliente_socket,)).start()
+        thread = threading.Thread(target=self.processar_operacoes_cliente, args=(cliente_socket, next(self.conexoes)))
+        thread.start()
+        self.clientes = [cliente for cliente in self.clientes if cliente.is_alive()]
+        self.clientes.append(thread)
+
+    def aguardar_clientes(self, timeout: float | None = None) -> None:
+        """
+        Aguarda as threads dos clientes conectados terminarem.
+        :param timeout: Tempo máximo de espera por cliente, em segundos.
+        :type timeout: float or None
+        """
+        for cliente in list(self.clientes):
+            cliente.join(timeout)
 
-    def processar_operacoes_cliente(self, cliente_socket) -> None:
+    def processar_operacoes_cliente(self, cliente_socket, conexao: int = 0) -> None:
         """
         Processa as operações do cliente.
         :param cliente_socket: Socket do cliente.
         :type cliente_socket: socket.socket
+        :param conexao: Identificador da conexão, usado na captura.
+        :type conexao: int
         """
+        escritor = EscritorResposta(cliente_socket)
         while self.disponivel:
             try:
                 ready_to_read, ready_to_write, in_error = select.select(
-                    [cliente_socket, ],
                     [cliente_socket, ],
                     [],
+                    [],
                     5
                 )
             except select.error:
@@ -96,11 +198,25 @@ class Servidor:
             if len(ready_to_read) > 0:
                 mensagem = cliente_socket.recv(utils.TAMANHO_BUFFER_PADRAO).decode()
                 if mensagem:
-                    self.processar_operacao(cliente_socket=cliente_socket, mensagem=mensagem)
+                    with self.perfilador.trecho('requisicao'):
+                        with self.portao:
+                            gravador = self.gravador
+                            if gravador is None:
+                                self.processar_operacao(escritor=escritor, mensagem=mensagem)
+                            else:
+                                gravador.processar(
+                                    conexao=conexao,
+                                    mensagem=mensagem,
+                                    processar=lambda: self.processar_operacao(escritor=escritor, mensagem=mensagem)
+                                )
+                        with self.perfilador.trecho('envio'):
+                            try:
+                                escritor.descarregar()
+                            except OSError:
+                                print('error de conexion')
+                                break
                 else:
                     break
-            if len(ready_to_write) > 0:
-                pass
             if len(in_error) > 0:
                 break
 
@@ -112,6 +228,8 @@ class Servidor:
         Encerra o servidor.
         """
         print('Apagando...')
+        self.perfilador.desativar()
+        self.encerrar_captura()
         self.desconectar()
         exit()
 
@@ -120,168 +238,226 @@ class Servidor:
         Desconecta o servidor.
         """
         self.disponivel = False
+        self.parar_aquecimento.set()
         self.socket.close()
 
     @staticmethod
-    def criar() -> Servidor:
-        """
-        Cria uma instância do servidor.
+    def criar(
+            modo_inicializacao: ModoInicializacao = ModoInicializacao.SEGUNDO_PLANO,
+            modo_perfil: ModoPerfil = ModoPerfil.TRECHOS,
+            captura: str | None = None
+    ) -> Servidor:
+        """
+        Cria uma instância do servidor. O perfilador é alternado em tempo de execução com SIGUSR1,
+        e a captura de mensagens com SIGUSR2.
+        :param modo_inicializacao: Como o cache de contas é aquecido ao iniciar.
+        :type modo_inicializacao: ModoInicializacao
+        :param modo_perfil: Perfilamento feito quando o perfilador é ativado.
+        :type modo_perfil: ModoPerfil
+        :param captura: Arquivo onde as mensagens recebidas são gravadas desde o início, se informado.
+        :type captura: str or None
         :rtype: Servidor
         """
-        servidor = Servidor()
+        servidor = Servidor(modo_inicializacao=modo_inicializacao, modo_perfil=modo_perfil)
         servidor.iniciar()
+        if captura is not None:
+            servidor.iniciar_captura(caminho=captura)
 
         signal.signal(signal.SIGINT, lambda signum, frame: servidor.encerrar())
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: servidor.perfilador.alternar())
+        if hasattr(signal, 'SIGUSR2'):
+            signal.signal(signal.SIGUSR2, lambda signum, frame: servidor.alternar_captura())
         return servidor
 
-    def processar_operacao_saldo(self, cliente_socket, mensagem: str) -> None:
+    def processar_operacao_saldo(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
-        Processa a operação de saldo.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        Processa a operação de saldo. A leitura não usa lock: a conta obtida é uma versão imutável.
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         """
-        solicitacao = OperacaoSaldo.desencapsular(mensagem=mensagem)
+        with self.perfilador.trecho('parse'):
+            solicitacao = OperacaoSaldo.desencapsular(mensagem=mensagem)
         rg = str(solicitacao.rg)
 
-        with lock:
+        with self.perfilador.trecho('armazenamento'):
             conta = Conta.obter_conta(rg=rg)
-            if conta:
-                resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta=f"Saldo: {conta.saldo}")
-            else:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
-            cliente_socket.send(resposta.encapsular().encode())
+        if conta:
+            resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta=f"Saldo: {conta.saldo}")
+        else:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
+        escritor.escrever(resposta.encapsular())
 
-    def processar_operacao_saque(self, cliente_socket, mensagem: str) -> None:
+    def processar_operacao_saque(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
         Processa a operação de saque.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         """
-        solicitacao = OperacaoSaque.desencapsular(mensagem=mensagem)
+        with self.perfilador.trecho('parse'):
+            solicitacao = OperacaoSaque.desencapsular(mensagem=mensagem)
         rg = str(solicitacao.rg)
 
-        with lock:
+        with self.perfilador.trecho('armazenamento'):
             conta = Conta.obter_conta(rg=rg)
-            if conta:
-                if conta.saldo >= solicitacao.valor:
-                    conta.sacar(valor=solicitacao.valor)
-                    resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Saque realizado com sucesso')
-                else:
-                    resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Saldo insuficiente')
+        if conta:
+            with self.perfilador.trecho('armazenamento'):
+                sacado = conta.sacar(valor=solicitacao.valor)
+            if sacado:
+                resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Saque realizado com sucesso')
             else:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
-            cliente_socket.send(resposta.encapsular().encode())
+                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Saldo insuficiente')
+        else:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
+        escritor.escrever(resposta.encapsular())
 
-    def processar_operacao_deposito(self, cliente_socket, mensagem: str) -> None:
+    def processar_operacao_deposito(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
         Processa a operação de depósito.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         """
-        solicitacao = OperacaoDeposito.desencapsular(mensagem=mensagem)
-        with lock:
-            rg = str(solicitacao.rg)
+        with self.perfilador.trecho('parse'):
+            solicitacao = OperacaoDeposito.desencapsular(mensagem=mensagem)
+        rg = str(solicitacao.rg)
 
+        with self.perfilador.trecho('armazenamento'):
             conta = Conta.obter_conta(rg=rg)
-            if conta:
+        if conta:
+            with self.perfilador.trecho('armazenamento'):
                 conta.depositar(valor=solicitacao.valor)
-                resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Depósito realizado com sucesso')
-            else:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
+            resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Depósito realizado com sucesso')
+        else:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente não encontrado')
 
-            cliente_socket.send(resposta.encapsular().encode())
+        escritor.escrever(resposta.encapsular())
 
-    def processar_operacao_transferencia(self, cliente_socket, mensagem: str) -> None:
+    def processar_operacao_transferencia(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
         Processa a operação de transferência.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         """
-        solicitacao = OperacaoTransferencia.desencapsular(mensagem=mensagem)
+        with self.perfilador.trecho('parse'):
+            solicitacao = OperacaoTransferencia.desencapsular(mensagem=mensagem)
 
         if solicitacao.rg_origem == solicitacao.rg_destino:
             resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Não é possível transferir para a mesma conta')
-            cliente_socket.send(resposta.encapsular().encode())
+            escritor.escrever(resposta.encapsular())
             return
 
-        with lock:
+        with self.perfilador.trecho('armazenamento'):
             conta_origem = Conta.obter_conta(rg=solicitacao.rg_origem)
             conta_destino = Conta.obter_conta(rg=solicitacao.rg_destino)
 
-            if conta_origem is None:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Conta de origem não encontrada')
-                cliente_socket.send(resposta.encapsular().encode())
-                return
-            if conta_destino is None:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Conta de destino não encontrada')
-                cliente_socket.send(resposta.encapsular().encode())
-                return
-            if conta_origem.saldo < solicitacao.valor:
-                resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Saldo insuficiente')
-                cliente_socket.send(resposta.encapsular().encode())
-                return
+        if conta_origem is None:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Conta de origem não encontrada')
+            escritor.escrever(resposta.encapsular())
+            return
+        if conta_destino is None:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Conta de destino não encontrada')
+            escritor.escrever(resposta.encapsular())
+            return
 
-            conta_origem.transferir(conta_destino=conta_destino, valor=solicitacao.valor)
-            resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Transferência realizada com sucesso')
-            cliente_socket.send(resposta.encapsular().encode())
+        with self.perfilador.trecho('armazenamento'):
+            transferido = conta_origem.transferir(conta_destino=conta_destino, valor=solicitacao.valor)
+        if not transferido:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Saldo insuficiente')
+            escritor.escrever(resposta.encapsular())
             return
 
-    def processar_operacao_login(self, cliente_socket, mensagem: str) -> None:
+        resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Transferência realizada com sucesso')
+        escritor.escrever(resposta.encapsular())
+        return
+
+    def processar_operacao_login(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
         Processa a operação de ‘login’.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         """
-        solicitacao = OperacaoLogin.desencapsular(mensagem=mensagem)
+        with self.perfilador.trecho('parse'):
+            solicitacao = OperacaoLogin.desencapsular(mensagem=mensagem)
         rg = str(solicitacao.rg)
-        conta = Conta.obter_conta(rg=rg)
+        with self.perfilador.trecho('armazenamento'):
+            conta = Conta.obter_conta(rg=rg)
         if conta:
             resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Login realizado con exito')
         else:
             resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Cliente no encontrado')
-        cliente_socket.send(resposta.encapsular().encode())
+        escritor.escrever(resposta.encapsular())
 
-    def processar_operacao(self, cliente_socket, mensagem: str) -> None:
+    def processar_operacao_estado(self, escritor: EscritorResposta, mensagem: str) -> None:
+        """
+        Processa a consulta de estado: responde com sucesso se o cache de contas já foi aquecido,
+        e com erro enquanto ele ainda estiver sendo aquecido.
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
+        :param mensagem: Comando recebido do cliente.
+        :type mensagem: str
+        """
+        with self.perfilador.trecho('parse'):
+            OperacaoEstado.desencapsular(mensagem=mensagem)
+        if self.esta_pronto():
+            resposta = RespostaSucesso(tempo=self.obter_e_incrementar_tempo(), resposta='Servidor pronto')
+        else:
+            resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Servidor aquecendo o cache de contas')
+        escritor.escrever(resposta.encapsular())
+
+    def processar_operacao(self, escritor: EscritorResposta, mensagem: str) -> None:
         """
         Atualiza o relógio lógico do servidor e processa a mensagem do cliente.
-        :param cliente_socket: Socket do cliente.
-        :type cliente_socket: socket.socket
+        :param escritor: Escritor de respostas do cliente.
+        :type escritor: EscritorResposta
         :param mensagem: Comando recebido do cliente.
         :type mensagem: str
         :rtype: None
         """
-        self.atualizar_tempo(tempo=Protocolo.obter_tempo(mensagem))
+        with self.perfilador.trecho('parse'):
+            tempo = Protocolo.obter_tempo(mensagem)
+        with self.perfilador.trecho('relogio'):
+            relogio = self.atualizar_tempo(tempo=tempo)
+        self.perfilador.marcar(relogio)
 
         if match(pattern=OperacaoSaldo.pattern, string=mensagem):
-            self.processar_operacao_saldo(cliente_socket, mensagem)
+            self.processar_operacao_saldo(escritor, mensagem)
         elif match(pattern=OperacaoSaque.pattern, string=mensagem):
-            self.processar_operacao_saque(cliente_socket, mensagem)
+            self.processar_operacao_saque(escritor, mensagem)
         elif match(pattern=OperacaoDeposito.pattern, string=mensagem):
-            self.processar_operacao_deposito(cliente_socket, mensagem)
+            self.processar_operacao_deposito(escritor, mensagem)
         elif match(pattern=OperacaoTransferencia.pattern, string=mensagem):
-            self.processar_operacao_transferencia(cliente_socket, mensagem)
+            self.processar_operacao_transferencia(escritor, mensagem)
         elif match(pattern=OperacaoLogin.pattern, string=mensagem):
-            self.processar_operacao_login(cliente_socket, mensagem)
+            self.processar_operacao_login(escritor, mensagem)
+        elif match(pattern=OperacaoEstado.pattern, string=mensagem):
+            self.processar_operacao_estado(escritor, mensagem)
         else:
             resposta = RespostaErro(tempo=self.obter_e_incrementar_tempo(), resposta='Operaçao inválida')
-            cliente_socket.send(resposta.encapsular().encode())
+            escritor.escrever(resposta.encapsular())
 
 
 def main():
     """
     Função principal.
     """
-    servidor = Servidor.criar()
+    modo_inicializacao = sys.argv[1].upper() if len(sys.argv) > 1 else ModoInicializacao.SEGUNDO_PLANO.name
+    modo_perfil = sys.argv[2].upper() if len(sys.argv) > 2 else ModoPerfil.TRECHOS.name
+    captura = sys.argv[3] if len(sys.argv) > 3 else None
+    servidor = Servidor.criar(
+        modo_inicializacao=ModoInicializacao[modo_inicializacao],
+        modo_perfil=ModoPerfil[modo_perfil],
+        captura=captura
+    )
     print('Esperando conexión...')
     while servidor.disponivel:
         servidor.aceitar_conexao()
@@ -0,0 +1,113 @@
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from recursos import utils
+from recursos.captura import Captura, Gravador, exportar_contas
+from recursos.conta import Conta
+from recursos.enums import ModoInicializacao
+from recursos.protocolo import OperacaoDeposito, OperacaoSaque, OperacaoTransferencia
+from reproducao import (
+    Reprodutor,
+    aceitar_conexoes,
+    comparar_saldos,
+    obter_porta_livre,
+    preparar_contas,
+    reproduzir_localmente,
+)
+from servidor import Servidor
+
+RGS = [str(i) * 10 for i in range(6)]
+
+
+class TestCaptura(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = tempfile.TemporaryDirectory()
+        self.contas = Path(self.pasta.name) / 'contas'
+        self.contas.mkdir()
+        for rg in RGS:
+            with open(self.contas / f'{rg}.json', 'w') as f:
+                json.dump({'rg': rg, 'nome': 'Teste', 'saldo': 20.0}, f)
+        Conta.usar_pasta(str(self.contas))
+
+    def tearDown(self) -> None:
+        Conta.usar_pasta('contas')
+        self.pasta.cleanup()
+
+    def test_gravador_e_captura_ida_e_volta(self) -> None:
+        inicial = exportar_contas()
+        gravador = Gravador(caminho=Path(self.pasta.name) / 'cap.trace.gz')
+        gravador.processar(conexao=1, mensagem='t:1|op:1|rg:0000000000', processar=lambda: None)
+        gravador.registrar(conexao=2, mensagem='t:3|op:9|rg:\tção', instante=1500)
+        Conta.obter_conta(rg=RGS[0]).depositar(5.0)
+        caminho = gravador.fechar()
+
+        captura = Captura.ler(caminho)
+        self.assertEqual(captura.contas, inicial)
+        self.assertEqual([(conexao, mensagem) for _, conexao, mensagem in captura.mensagens], [
+            (1, 't:1|op:1|rg:0000000000'),
+            (2, 't:3|op:9|rg:\tção'),
+        ])
+        self.assertEqual(captura.mensagens[1][0], 1500)
+        self.assertEqual(captura.saldos, {**{rg: 20.0 for rg in RGS}, RGS[0]: 25.0})
+
+    def test_comparar_saldos(self) -> None:
+        self.assertEqual(comparar_saldos({rg: 20.0 for rg in RGS}), [])
+        divergencias = comparar_saldos({RGS[0]: 21.0, '9999999999': 1.0})
+        self.assertEqual(divergencias, [
+            f'{RGS[0]}: esperado 21.0, obtido 20.0',
+            '9999999999: esperado 1.0, obtido None',
+        ])
+
+    def test_reproducao_serial_de_captura_alternada_sob_carga(self) -> None:
+        with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+            servidor = Servidor(modo_inicializacao=ModoInicializacao.BLOQUEANTE, porta=obter_porta_livre())
+            servidor.iniciar()
+            threading.Thread(target=aceitar_conexoes, args=(servidor,), daemon=True).start()
+            parar = threading.Event()
+
+            def cliente(semente: int) -> None:
+                aleatorio = random.Random(semente)
+                with socket.create_connection(('127.0.0.1', servidor.porta)) as cliente_socket:
+                    tempo = 0
+                    while not parar.is_set():
+                        tempo += 1
+                        origem, destino = aleatorio.sample(RGS, 2)
+                        mensagem = aleatorio.choice([
+                            OperacaoTransferencia(tempo, origem, destino, 7.0),
+                            OperacaoSaque(tempo, origem, 5.0),
+                            OperacaoDeposito(tempo, origem, 3.0),
+                        ])
+                        cliente_socket.sendall(mensagem.encapsular().encode())
+                        cliente_socket.recv(utils.TAMANHO_BUFFER_PADRAO)
+
+            clientes = [threading.Thread(target=cliente, args=(semente,)) for semente in range(8)]
+            for thread in clientes:
+                thread.start()
+            time.sleep(0.1)
+            servidor.iniciar_captura(caminho=str(Path(self.pasta.name) / 'cap.trace.gz'))
+            time.sleep(0.3)
+            servidor.encerrar_captura()
+            parar.set()
+            for thread in clientes:
+                thread.join()
+            servidor.desconectar()
+            servidor.aguardar_clientes()
+
+        captura = Captura.ler(Path(self.pasta.name) / 'cap.trace.gz')
+        self.assertGreater(len(captura.mensagens), 0)
+        preparar_contas(captura, Path(self.pasta.name) / 'reproducao')
+        Conta.usar_pasta(str(Path(self.pasta.name) / 'reproducao'))
+        reproduzir_localmente(Reprodutor(captura, velocidade=0))
+        self.assertEqual(comparar_saldos(captura.saldos), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
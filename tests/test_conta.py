@@ -0,0 +1,108 @@
+import json
+import random
+import sys
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from recursos import conta
+from recursos.conta import Conta
+
+RGS = [str(i) * 10 for i in range(10)]
+
+
+class TestConta(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = tempfile.TemporaryDirectory()
+        for rg in RGS:
+            with open(Path(self.pasta.name) / f'{rg}.json', 'w') as f:
+                json.dump({'rg': rg, 'nome': 'Teste', 'saldo': 100.0}, f)
+        Conta.usar_pasta(self.pasta.name)
+
+    def tearDown(self) -> None:
+        Conta.usar_pasta('contas')
+        self.pasta.cleanup()
+
+    def ler_arquivo(self, rg: str) -> dict:
+        with open(Path(self.pasta.name) / f'{rg}.json') as f:
+            return json.load(f)
+
+    def test_comparar_e_trocar_rejeita_versao_desatualizada(self) -> None:
+        lida = Conta.obter_conta(rg=RGS[0])
+        self.assertTrue(lida.depositar(10.0))
+        self.assertFalse(Conta.comparar_e_trocar(lida.com_saldo(0.0)))
+        self.assertEqual(Conta.obter_conta(rg=RGS[0]).saldo, 110.0)
+        self.assertEqual(self.ler_arquivo(RGS[0])['versao'], 1)
+
+    def test_comparar_e_trocar_rejeita_conta_repetida(self) -> None:
+        lida = Conta.obter_conta(rg=RGS[0])
+        with self.assertRaises(ValueError):
+            Conta.comparar_e_trocar(lida.com_saldo(0.0), lida.com_saldo(200.0))
+
+    def test_carregar_conta_mantem_versao_ja_publicada(self) -> None:
+        publicada = Conta(rg=RGS[0], nome='Teste', saldo=7.0, versao=3)
+        conta._cache[RGS[0]] = publicada
+        self.assertIs(Conta.carregar_conta(rg=RGS[0]), publicada)
+        conta._cache.clear()
+        self.assertEqual(Conta.carregar_conta(rg=RGS[0]).saldo, 100.0)
+        self.assertIsNone(Conta.carregar_conta(rg='123'))
+        self.assertNotIn('123', conta._cache)
+
+    def test_persistir_nao_volta_a_versao_antiga(self) -> None:
+        antiga = Conta.obter_conta(rg=RGS[0]).com_saldo(1.0)
+        nova = antiga.com_saldo(2.0)
+        nova.persistir()
+        antiga.persistir()
+        self.assertEqual(self.ler_arquivo(RGS[0]), {'rg': RGS[0], 'nome': 'Teste', 'saldo': 2.0, 'versao': 2})
+
+    def test_atualizacoes_concorrentes_conservam_saldo_e_versoes(self) -> None:
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        atualizacoes = Counter()
+        lock = threading.Lock()
+
+        def operar(semente: int) -> None:
+            aleatorio = random.Random(semente)
+            locais = Counter()
+            for _ in range(2000):
+                origem, destino = aleatorio.sample(RGS, 2)
+                operacao = aleatorio.random()
+                if operacao < 0.5:
+                    valor = aleatorio.choice([1.0, 50.0, 500.0])
+                    if Conta.obter_conta(rg=origem).transferir(Conta.obter_conta(rg=destino), valor):
+                        locais[origem] += 1
+                        locais[destino] += 1
+                elif operacao < 0.75:
+                    if Conta.obter_conta(rg=origem).sacar(1.0):
+                        locais[origem] += 1
+                        Conta.obter_conta(rg=destino).depositar(1.0)
+                        locais[destino] += 1
+                else:
+                    Conta.obter_conta(rg=origem).saldo
+            with lock:
+                atualizacoes.update(locais)
+
+        try:
+            threads = [threading.Thread(target=operar, args=(semente,)) for semente in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(intervalo)
+
+        contas = {rg: Conta.obter_conta(rg=rg) for rg in RGS}
+        self.assertAlmostEqual(sum(c.saldo for c in contas.values()), 100.0 * len(RGS))
+        for rg, c in contas.items():
+            self.assertGreaterEqual(c.saldo, 0.0)
+            self.assertEqual(c.versao, atualizacoes[rg])
+            self.assertEqual(self.ler_arquivo(rg), c.__dict__)
+
+        conta._cache.clear()
+        self.assertAlmostEqual(sum(Conta.obter_conta(rg=rg).saldo for rg in RGS), 100.0 * len(RGS))
+
+
+if __name__ == '__main__':
+    unittest.main()
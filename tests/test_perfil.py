@@ -0,0 +1,126 @@
+from __future__ import annotations
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from recursos.enums import ModoPerfil
+from recursos import perfil
+from recursos.perfil import CPROFILE_GLOBAL, TRECHO_NULO, Perfilador
+
+
+class TestPerfilador(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.pasta.cleanup()
+
+    def criar(self, modo: ModoPerfil = ModoPerfil.TRECHOS) -> Perfilador:
+        return Perfilador(modo=modo, pasta=self.pasta.name)
+
+    @staticmethod
+    def ler_trechos(pasta: Path) -> list[dict]:
+        with open(pasta / 'trechos.json') as f:
+            return json.load(f)['traceEvents']
+
+    def test_desativado_nao_cria_trechos(self) -> None:
+        perfilador = self.criar()
+        lock = threading.Lock()
+        self.assertIs(perfilador.trecho('parse'), TRECHO_NULO)
+        self.assertIs(perfilador.esperar(lock), lock)
+
+    def test_trechos_recebem_o_tempo_da_propria_requisicao(self) -> None:
+        perfilador = self.criar()
+        perfilador.ativar()
+        with perfilador.trecho('requisicao'):
+            with perfilador.trecho('parse'):
+                pass
+            perfilador.marcar(42)
+        with perfilador.trecho('requisicao'):
+            pass
+        pasta = perfilador.desativar()
+        pasta.join()
+
+        pastas = list(Path(self.pasta.name).iterdir())
+        tempos = [(trecho['name'], trecho['args']['relogio']) for trecho in self.ler_trechos(pastas[0])]
+        self.assertEqual(tempos, [('parse', 42), ('requisicao', 42), ('requisicao', None)])
+
+    def test_trecho_em_curso_e_gravado_com_a_sua_sessao(self) -> None:
+        perfilador = self.criar()
+        perfilador.ativar()
+        dentro, liberar = threading.Event(), threading.Event()
+
+        def requisicao() -> None:
+            with perfilador.trecho('requisicao'):
+                dentro.set()
+                liberar.wait()
+
+        thread = threading.Thread(target=requisicao)
+        thread.start()
+        dentro.wait()
+        gravacao = perfilador.desativar()
+        perfilador.ativar()
+        liberar.set()
+        thread.join()
+        gravacao.join()
+
+        pastas = list(Path(self.pasta.name).iterdir())
+        self.assertEqual(len(pastas), 1)
+        self.assertEqual([trecho['name'] for trecho in self.ler_trechos(pastas[0])], ['requisicao'])
+        self.assertEqual(len(perfilador.eventos), 0)
+        perfilador.desativar().join()
+
+    def test_trecho_que_excede_a_espera_e_descartado(self) -> None:
+        perfilador = self.criar()
+        perfilador.ativar()
+        dentro, liberar = threading.Event(), threading.Event()
+        erros = []
+
+        def requisicao() -> None:
+            try:
+                with perfilador.trecho('requisicao'):
+                    with perfilador.trecho('parse'):
+                        pass
+                    dentro.set()
+                    liberar.wait()
+            except Exception as erro:
+                erros.append(erro)
+
+        thread = threading.Thread(target=requisicao)
+        thread.start()
+        dentro.wait()
+        with mock.patch.object(perfil, 'ESPERA_GRAVACAO', 0.01):
+            perfilador.desativar().join()
+        liberar.set()
+        thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertEqual(perfilador.em_curso, {})
+        pasta = next(Path(self.pasta.name).iterdir())
+        self.assertEqual(self.ler_trechos(pasta), [])
+
+    def test_cprofile_por_thread_ou_por_processo(self) -> None:
+        perfilador = self.criar(ModoPerfil.CPROFILE)
+        perfilador.ativar()
+
+        def requisicao() -> None:
+            with perfilador.trecho('requisicao'):
+                sum(range(1000))
+
+        threads = [threading.Thread(target=requisicao) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        perfilador.desativar().join()
+
+        pasta = next(Path(self.pasta.name).iterdir())
+        perfis = list(pasta.glob('cprofile-*.prof'))
+        self.assertEqual(len(perfis), 1 if CPROFILE_GLOBAL else 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from recursos import conta
+from recursos.conta import Conta
+from recursos.protocolo import OperacaoEstado, RespostaErro, RespostaSucesso, match
+from reproducao import obter_porta_livre
+from servidor import Servidor
+
+
+class EscritorFalso:
+    def __init__(self) -> None:
+        self.respostas = []
+
+    def escrever(self, resposta: str) -> None:
+        self.respostas.append(resposta)
+
+
+class TestEstado(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pasta = tempfile.TemporaryDirectory()
+        for rg, saldo in (('1111111111', 10.0), ('2222222222', 20.0)):
+            with open(Path(self.pasta.name) / f'{rg}.json', 'w') as f:
+                json.dump({'rg': rg, 'nome': 'Teste', 'saldo': saldo}, f)
+        Conta.usar_pasta(self.pasta.name)
+        self.servidor = Servidor(porta=obter_porta_livre())
+
+    def tearDown(self) -> None:
+        Conta.usar_pasta('contas')
+        self.pasta.cleanup()
+
+    def consultar_estado(self) -> str:
+        escritor = EscritorFalso()
+        self.servidor.processar_operacao(escritor=escritor, mensagem=OperacaoEstado(tempo=1).encapsular())
+        return escritor.respostas[-1]
+
+    def test_estado_responde_erro_ate_o_cache_ser_aquecido(self) -> None:
+        self.assertTrue(match(RespostaErro.pattern, self.consultar_estado()))
+        self.servidor.disponivel = True
+        self.servidor.aquecer_contas()
+        self.assertTrue(match(RespostaSucesso.pattern, self.consultar_estado()))
+
+    def test_aquecimento_interrompido_nao_sinaliza_pronto(self) -> None:
+        self.servidor.disponivel = True
+        self.servidor.parar_aquecimento.set()
+        self.servidor.aquecer_contas()
+        self.assertFalse(self.servidor.esta_pronto())
+        self.assertEqual(conta._cache, {})
+
+    def test_aquecimento_carrega_todas_as_contas(self) -> None:
+        parar = threading.Event()
+        self.assertEqual(Conta.aquecer_cache(parar=parar), 2)
+
+
+class TestRelogio(unittest.TestCase):
+    def test_tempos_concorrentes_sao_unicos(self) -> None:
+        servidor = Servidor(porta=obter_porta_livre())
+        tempos = []
+
+        def incrementar() -> None:
+            locais = [servidor.obter_e_incrementar_tempo() for _ in range(3000)]
+            tempos.extend(locais)
+
+        threads = [threading.Thread(target=incrementar) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(tempos)), 24000)
+        self.assertEqual(max(tempos), servidor.relogio)
+
+
+if __name__ == '__main__':
+    unittest.main()